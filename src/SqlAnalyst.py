@@ -17,17 +17,34 @@
 
 import os
 import glob
+import fnmatch
 import re
 import sys
+import hashlib
+import gzip
+import bz2
+import lzma
+import zipfile
+import sqlite3
+import threading
+import time
+import queue
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 
 class LogWriter(object):
-    """if log filename is given in constructor, the file will be opened automatically, you can use it directly"""
+    """if log filename is given in constructor, the file will be opened automatically, you can use it directly
+    flags are leveled, see LogLevels. any flag not listed there is at DefaultLogLevel.
+    a log below the current level costs nothing: its contents are never formatted.
+    in hot loops, test enabled(flag) once and skip the log() calls entirely."""
     DefaultWriter = sys.stdout
+    LogLevels = {"warning": 30, "error": 40}
+    DefaultLogLevel = 10
 
     def __init__(self,fname=None):
         super(LogWriter, self).__init__()
-        self.Verbose = True
+        self.Level = 0
         self.DefaultWriter = sys.stdout
         self.Writer = self.DefaultWriter
         self.fname=fname
@@ -52,11 +69,24 @@ class LogWriter(object):
         when flag is 'error', upper or lower, the log will be output whatever verbose is set to.
         when force=True is set, this log will also be forced to output
         """
+        if not (force or self.enabled(mflag)):
+            return
         content = [str(c) for c in mcontent]
         flag = str(mflag)
-        if self.Verbose or (flag.lower() == "error") or force:
-            self.Writer.write("##" + flag.upper() + "##:" + " ".join(content) + os.linesep)
+        self.Writer.write("##" + flag.upper() + "##:" + " ".join(content) + os.linesep)
+
+    def enabled(self, mflag):
+        """whether a log with this flag would be output"""
+        return self.LogLevels.get(str(mflag).lower(), self.DefaultLogLevel) >= self.Level
+
+    @property
+    def Verbose(self):
+        """True when ordinary logs are output, setting it is the same as set_log_verbose()"""
+        return self.Level <= self.DefaultLogLevel
 
+    @Verbose.setter
+    def Verbose(self, isverbose):
+        self.Level = 0 if isverbose else self.LogLevels["error"]
 
     def save(self):
         """this write your logs to file without closing it. you can do this anytime in case of failing reaching close().
@@ -66,9 +96,13 @@ class LogWriter(object):
             self.Writer=open(self.fname,"a+")
 
     def set_log_verbose(self, isverbose):
-        """mute unnecessary log by set false"""
+        """mute unnecessary log by set false, only errors are left"""
         self.Verbose = isverbose
 
+    def set_log_level(self, level):
+        """only output flags at or above this level, e.g. LogWriter.LogLevels['warning']"""
+        self.Level = level
+
     def set_log_writer(self, writer):
         """create an io-stream yourself and pass it in. logs will be output to it."""
         self.Writer = writer
@@ -83,15 +117,21 @@ class LogWriter(object):
 
 
 
-class SqlEntity(LogWriter):
+class SqlEntity(object):
     """this is tree node class,containing all necessary information about a sql file and its structure
     just dir it and help(SqlEntity.method)
+    entities share the log writer given (the SqlAnalyst's). without one, a muted writer of its own is used.
     """
-    def __init__(self, filename, creates, deps):
+    def __init__(self, filename, creates, deps, logger=None, statements=None):
         super(SqlEntity, self).__init__()
+        if logger is None:
+            logger = LogWriter()
+            logger.set_log_verbose(False)
+        self.Logger = logger
         self.FileName = filename
         self.Creates = creates  # I create these tables
         self.Deps = deps  # I need them to be done first (db name ,table name)
+        self.Statements = statements if statements is not None else []  # (first line, last line, creates, deps)
         self.DepFileEntities = []  # I need these tables
         self.SubRoutineEntities = []  # they need me
         self.InternalDeps = []  # for my own usage
@@ -99,30 +139,69 @@ class SqlEntity(LogWriter):
         self.IntactDepTables = []
         self.Complete = True
 
+    def log(self, mflag, *mcontent, force=False):
+        self.Logger.log(mflag, *mcontent, force=force)
+
+    def __reset_relation__(self):
+        """forget all bindings, so __bound_relation__ can be done again"""
+        self.DepFileEntities = []
+        self.SubRoutineEntities = []
+        self.InternalDeps = []
+        self.MissingDeps = []
+        self.IntactDepTables = []
+        self.Complete = True
+
+    def __unbound_relation__(self):
+        """undo all bindings of this entity on both sides, return the entities that depended on it"""
+        for entity in self.DepFileEntities:
+            entity.SubRoutineEntities = [e for e in entity.SubRoutineEntities if e is not self]
+        sons = self.SubRoutineEntities
+        for entity in sons:
+            entity.DepFileEntities = [e for e in entity.DepFileEntities if e is not self]
+        self.__reset_relation__()
+        return sons
+
+    def __recalculate_missing__(self):
+        """after its providers changed, find intact and missing deps again from DepFileEntities"""
+        dep_tables = set(d[1] for d in self.Deps)
+        self.IntactDepTables = [c for entity in self.DepFileEntities for c in entity.Creates if c in dep_tables]
+        self.__calculate_missing_deps__()
+
     def __bound_relation__(self, entity_list):
         """each pair of nodes should only bound once"""
         dep_tables = [db_table[1] for db_table in self.Deps]
+        verbose = self.Logger.enabled("log")
         for entity in entity_list:
             if self is entity:
                 continue
-            self.log("LOG", "Comparing:", self.FileName, 'with', entity.FileName)  ########################LOG
+            if verbose:
+                self.log("LOG", "Comparing:", self.FileName, 'with', entity.FileName)  ########################LOG
             should_depend = False
             should_gen = False
             if entity not in self.DepFileEntities:  ## do i depend on it?
+                provided = []
                 for c in entity.Creates:
-                    if c in dep_tables:
+                    if c in dep_tables and c not in provided:
+                        provided.append(c)
                         should_depend = True
-                        self.log("log", self.FileName, "requires", entity.FileName, "to provide table:", c)
+                        if verbose:
+                            self.log("log", self.FileName, "requires", entity.FileName, "to provide table:", c)
                         if c in self.IntactDepTables:
                             self.log("error", "Duplicate Table", c, "created by", entity.FileName)
                         else:
                             self.IntactDepTables.append(c)
             if entity not in self.SubRoutineEntities:  ## is it my son ?
+                provided = []
                 for d in entity.Deps:
-                    if d[1] in self.Creates:
+                    if d[1] in self.Creates and d[1] not in provided:
+                        provided.append(d[1])
                         should_gen = True
-                        entity.IntactDepTables.append(d[1])  ## my son's table has a source from me
-                        self.log("log", self.FileName, "is a father of", entity.FileName, "by providing table:", d[1])
+                        if verbose:
+                            self.log("log", self.FileName, "is a father of", entity.FileName, "by providing table:", d[1])
+                        if d[1] in entity.IntactDepTables:
+                            self.log("error", "Duplicate Table", d[1], "created by", self.FileName)
+                        else:
+                            entity.IntactDepTables.append(d[1])  ## my son's table has a source from me
             if should_gen and should_depend:
                 self.log("error", "Loop Depend:", self.FileName, entity.FileName)
             if should_depend:  ## i depend on it
@@ -131,6 +210,9 @@ class SqlEntity(LogWriter):
             if should_gen:  ## it's my son
                 self.SubRoutineEntities.append(entity)
                 entity.DepFileEntities.append(self)
+        self.__calculate_missing_deps__()
+
+    def __calculate_missing_deps__(self):
         self.InternalDeps = [d[1] for d in self.Deps if d[1] not in self.IntactDepTables]
         self.MissingDeps = [d for d in self.InternalDeps if d not in self.Creates]
         self.MissingDeps = sorted(self.MissingDeps, key=len, reverse=True)
@@ -235,6 +317,12 @@ class SqlEntity(LogWriter):
         print("Creates:", "\n".join(self.Creates))
         print("Uses:", "\n".join([d[0] + d[1] for d in self.Deps if d[1] not in self.InternalDeps]))
         print("Missing:", "\n".join(self.MissingDeps))
+        if len(self.Statements) > 0:
+            print("Created at:", "\n".join(self.created_at()))
+
+    def created_at(self):
+        """where each table is created in this sql, like 'tname: lines 3-9'"""
+        return ["%s: lines %d-%d" % (c, first, last) for (first, last, creates, deps) in self.Statements for c in creates]
 
 
 ###########################
@@ -260,8 +348,21 @@ coding usage:
 0 from sqla import SqlAnalyst
 1 sa = SqlAnalyst.SqlAnalyst()
 2 sa.run("d:/works/sqls/sqljob_1")
-3 sa.show()"""
+3 sa.show()
+
+compressed sqls (.sql.gz .sql.bz2 .sql.xz) are read directly, and a .zip bundle
+can be given instead of a folder: sa.run("sqljob_1.zip"), nothing is extracted to disk."""
     DefaultSearchPattern = "*.sql"
+    DefaultWorkers = 4
+    StatementCacheSize = 100000  # statements kept in StatementCache, least recently used go first
+    FileCacheSize = 10000  # files kept in FileCache
+    CreatePattern = re.compile(r"""(?:create\s+table\s+(?:if\s+not\s+exists\s+)?)(\w+)""")
+    ##       dep_pattern1="""(?:from\s+)(\w+\s*\:\s*\:)?(?:\s*)(\w+)"""
+    ##       dep_pattern2="""(?:join\s+)(\w+\s*\:\s*\:)?(?:\s*)(\w+)(?:\s+\w+)?(?:\s+on)"""
+    DepPattern = re.compile(r"""(?:(?:from|join)\s+)(?:(\w+)(?:\s*\:\s*\:))?(?:\s*)(\w+)""")
+    CompressedOpeners = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open}
+    # a statement ends at ';', or where a new 'create table' line begins
+    CreateLine = re.compile(r"""^[ \t]*(?=create\s+table\s)""", re.M)
 
     def __init__(self, encoding="utf-8", ):
         super(SqlAnalyst, self).__init__()
@@ -271,39 +372,164 @@ coding usage:
         self.RootEntities = []
         self.BaseEntities = []
         self.MissingTables = []
+        self.ConfirmedMissing = set()  # every missing list given to __calculate_incomplete__ since run()
         self.DefaultEncoding = encoding
+        self.Lock = threading.Lock()
+        self.Workers = self.DefaultWorkers  # threads reading sql files
+        self.TargetDir = "."
+        self.FileCache = OrderedDict()  # (file content sha1, encoding) -> (creates, deps, statements)
+        self.StatementCache = OrderedDict()  # statement text -> (creates, deps), both kept by reset()
+        self.CacheLock = threading.Lock()
+        self.Store = None  # SqlStore, see use_store()
+        self.StoreChunk = 1000  # files read between two writes to the store
         # command arguments
         self.SearchPattern = self.DefaultSearchPattern
 
     def run(self, tardir="."):
         """if the folder containing sqls is not explicitly given,
         this scans the current working directory
-        use os.getcwd() and os.chdir() to know more about your position.
+        tardir can also be a .zip bundle, its member paths become the file names.
+        unlike a folder, where only sqls directly under it are scanned, members of a
+        bundle are picked up at any depth, as bundles usually wrap the jobs in a folder.
+        files are read and decompressed in parallel, see set_workers().
+        relative tardir is resolved against os.getcwd(), the working directory is never changed,
+        so different SqlAnalyst instances can run() in different threads at the same time.
+        results of one run() are published together, concurrent runs on one instance do not mix.
 
         since sqla can not reach your database interface,
         run() assumes all missing tables exists in your database,and set all nodes as 'complete'
         you can provide a missing-list to __calculate_incomplete() method, after run().
         if missing list is provided, show() will filter incomplete trees by default.
         """
-        cur_dir = os.getcwd()
-        for filename in self.__scan__(tardir):
-            (c, d) = self.__discover_dep__(filename)
-            a = SqlEntity(filename, c, d)
-            a.set_log_verbose(self.Verbose)
-            self.EntityList.append(a)
-        self.__build_forest__()
-        self.__calculate_roots__()
-        self.__calculate_bases__()
-        self.__calculate_missing__()
-        os.chdir(cur_dir)
+        if self.Store is not None:
+            self.__run_store__(tardir)
+            self.log("Done")
+            return
+        file_names = self.__scan__(tardir)
+        archive = zipfile.ZipFile(tardir) if self.__is_archive__(tardir) else None
+        try:
+            with ThreadPoolExecutor(self.Workers) as executor:
+                discovered = list(executor.map(lambda f: self.__discover_dep__(f, tardir, archive), file_names))
+        finally:
+            if archive is not None:
+                archive.close()
+        entity_list = []
+        for filename, (c, d, s) in zip(file_names, discovered):
+            a = SqlEntity(filename, c, d, self, s)
+            entity_list.append(a)
+        self.__build_forest__(entity_list)
+        with self.Lock:
+            self.TargetDir = tardir
+            self.ConfirmedMissing = set()
+            self.FileNames = file_names
+            self.EntityList = entity_list
+            self.__calculate_roots__()
+            self.__calculate_bases__()
+            self.__calculate_missing__()
         self.log("Done")
 
+    def use_store(self, path):
+        """keep the analysis in a sqlite database file instead of memory, for huge folders.
+        run() then fills the database, and show/find/show_roots/show_leaves/show_info/show_missing,
+        show_by_root_no/show_failure_files/gen_drop_all/gen_drop_mid, check_catalog and update work against it.
+        EntityList and other in-memory results stay empty.
+        an existing analysis in that file is replaced by the next run()."""
+        self.Store = SqlStore(path, self)
+        return self.Store
+
+    def __run_store__(self, tardir):
+        file_names = self.__scan__(tardir)
+        self.Store.clear()
+        archive = zipfile.ZipFile(tardir) if self.__is_archive__(tardir) else None
+        try:
+            with ThreadPoolExecutor(self.Workers) as executor:
+                for i in range(0, len(file_names), self.StoreChunk):
+                    chunk = file_names[i:i + self.StoreChunk]
+                    discovered = executor.map(lambda f: self.__discover_dep__(f, tardir, archive), chunk)
+                    self.Store.add_entities(zip(chunk, discovered))
+                    self.log("stored", i + len(chunk), "of", len(file_names), "files")
+        finally:
+            if archive is not None:
+                archive.close()
+        self.Store.build()
+        with self.Lock:
+            self.TargetDir = tardir
+            self.ConfirmedMissing = set()
+            self.reset()
+            self.MissingTables = []
+
+    def update(self, filename):
+        """after run(), re-analyze one edited (or newly added) sql-file of the same folder.
+        only statements whose text changed are extracted again, the entity's
+        Creates/Deps are patched in place, then only this file is bound again against the others.
+        if the file has been deleted, its entity is removed.
+        missing lists given to __calculate_incomplete__ (-b, check_catalog) since run() are applied again."""
+        tardir = self.TargetDir
+        archive = zipfile.ZipFile(tardir) if self.__is_archive__(tardir) else None
+        discovered = None
+        try:
+            discovered = self.__discover_dep__(filename, tardir, archive)
+        except (FileNotFoundError, KeyError):  # KeyError: no such member in the bundle
+            self.log("warning", filename, "no longer exists, removed")
+        finally:
+            if archive is not None:
+                archive.close()
+        if self.Store is not None:
+            self.Store.update_entity(filename, discovered)
+            self.Store.reset_complete()
+            self.Store.calculate_incomplete(self.ConfirmedMissing)
+            self.log("Updated", filename)
+            return
+        with self.Lock:
+            entity = None
+            for e in self.EntityList:
+                if e.FileName == filename:
+                    entity = e
+                    break
+            affected = []  # entities whose providers may have changed
+            if entity is not None:
+                affected.extend(entity.__unbound_relation__())
+            if discovered is None:
+                if entity is not None:
+                    self.EntityList.remove(entity)
+                if filename in self.FileNames:
+                    self.FileNames.remove(filename)
+            else:
+                (c, d, s) = discovered
+                if entity is None:
+                    entity = SqlEntity(filename, c, d, self, s)
+                    self.EntityList.append(entity)
+                    self.FileNames.append(filename)
+                else:
+                    entity.Creates[:] = c
+                    entity.Deps[:] = d
+                    entity.Statements[:] = s
+                others = [e for e in self.EntityList if e is not entity]
+                creates = set(c)
+                affected.extend(e for e in others if any(dep[1] in creates for dep in e.Deps))
+                entity.__bound_relation__(others)
+            done = set()
+            for e in affected:
+                if e is not entity and id(e) not in done:
+                    done.add(id(e))
+                    e.__recalculate_missing__()
+            self.__calculate_roots__()
+            self.__calculate_bases__()
+            self.__calculate_missing__()
+            for e in self.EntityList:
+                e.Complete = True
+            self.__calculate_incomplete__(self.ConfirmedMissing)
+        self.log("Updated", filename)
+
     def show(self, block_incomplete=True):
         """after analyzing, use this to show the default-style forest
         by default, all nodes are initialized as 'complete', hence all trees will be shown.
         but if you provided a missing list to __calculate_incomplete() after run(),
         the block_incomplete=True will hide those invalid trees that has missing deps.
         """
+        if self.Store is not None:
+            self.__show_store__(block_incomplete)
+            return
         total_trees = len(self.RootEntities)
         failure_trees = len([e for e in self.RootEntities if not e.Complete])
         print("There are", total_trees, "trees in total,in which",failure_trees,"trees failed")
@@ -314,8 +540,39 @@ coding usage:
                 continue
             e.show_tree()
 
+    def __show_store__(self, block_incomplete):
+        total_trees = 0
+        failure_trees = 0
+        for (entity_id, fname, complete) in self.Store.roots():
+            total_trees += 1
+            failure_trees += (not complete)
+        print("There are", total_trees, "trees in total,in which",failure_trees,"trees failed")
+        print("showing",total_trees-failure_trees,"trees")
+        print("Each tree's Root is marked by \'*\'")
+        for (entity_id, fname, complete) in self.Store.roots():
+            if block_incomplete and (not complete):
+                continue
+            self.__depth_traverse_store__(entity_id, fname)
+
+    def __depth_traverse_store__(self, entity_id, fname, depth=0, path=()):
+        prefix = ""
+        if depth == 0:
+            prefix = '*'
+        print(prefix + "\t |" * depth + " " + fname)
+        path = path + (entity_id,)
+        for (dep_id, dep_fname) in self.Store.deps_of(entity_id):
+            if dep_id not in path:  # loop depend
+                self.__depth_traverse_store__(dep_id, dep_fname, depth + 1, path)
+
     def find(self, table):
         """return sql file-name of its creation"""
+        if self.Store is not None:
+            found = self.Store.find(table)
+            for fname in found:
+                print("Table found in", fname)
+            if len(found) == 0:
+                print("Table Not Found")
+            return
         Found = False
         for e in self.RootEntities:
             Found = Found or e.find_table(table)
@@ -326,8 +583,11 @@ coding usage:
         """show all top level tasks information"""
         sum = 0
         print("following SQL should be executed At Last")
-        for entity in self.RootEntities:
-            print('[', sum, ']', entity.FileName)
+        roots = (entity.FileName for entity in self.RootEntities)
+        if self.Store is not None:
+            roots = (fname for (entity_id, fname, complete) in self.Store.roots())
+        for fname in roots:
+            print('[', sum, ']', fname)
             sum = sum + 1
         print("Final Tasks:", sum)
 
@@ -335,13 +595,29 @@ coding usage:
         """show all bottom level tasks information"""
         sum = 0
         print("following SQL can be executed Firstly safely")
-        for entity in self.BaseEntities:
-            print('[', sum, ']', entity.FileName)
+        bases = (entity.FileName for entity in self.BaseEntities)
+        if self.Store is not None:
+            bases = (fname for (entity_id, fname, complete) in self.Store.bases())
+        for fname in bases:
+            print('[', sum, ']', fname)
             sum = sum + 1
         print("Base Tasks:", sum)
 
     def show_info(self, fname):
         """show deps/creates/missing of a sql-file"""
+        if self.Store is not None:
+            info = self.Store.info(fname)
+            if info is None:
+                print("file not found")
+                return
+            (creates, uses, missing, created_at) = info
+            print("Filename:", fname)
+            print("Creates:", "\n".join(creates))
+            print("Uses:", "\n".join(uses))
+            print("Missing:", "\n".join(missing))
+            if len(created_at) > 0:
+                print("Created at:", "\n".join(created_at))
+            return
         found = False
         for e in self.EntityList:
             if fname == e.FileName:
@@ -353,14 +629,23 @@ coding usage:
 
     def show_missing(self):
         """all the missing tables under the directory"""
-
-        for tname in self.MissingTables:
+        missing_tables = self.MissingTables
+        if self.Store is not None:
+            missing_tables = self.Store.missing_tables()
+        for tname in missing_tables:
             self.log("missing", tname, force=True)
 
     def show_by_root_no(self, No):
         """using the index number printed by show_roots()
         this function shows one tree lead by that root task
         """
+        if self.Store is not None:
+            root = self.Store.root(No) if No >= 0 else None
+            if root is None:
+                print("invalid index number")
+                return
+            self.__depth_traverse_store__(root[0], root[1])
+            return
         if No < 0 or (No + 1) > len(self.RootEntities):
             print("invalid index number")
             return
@@ -374,6 +659,10 @@ coding usage:
     def show_failure_files(self):
         """show the key (bottle-neck) files that cause incompeletion
         which means, those sql-files are not complete, trees go through these files became invalid to execute"""
+        if self.Store is not None:
+            for fname in self.Store.failures():
+                self.show_info(fname)
+            return
         for e in self.EntityList:
             dep_success = True
             for dep in e.DepFileEntities:
@@ -396,7 +685,9 @@ coding usage:
         self.encoding = encoding
 
     def get_root_entities(self):
-        """return SqlEntity instance list of root nodes"""
+        """return SqlEntity instance list of root nodes, there is none in store mode"""
+        if self.Store is not None:
+            self.log("warning", "no SqlEntity in store mode, use show_roots()", force=True)
         return self.RootEntities
 
     def reset(self):
@@ -412,6 +703,10 @@ coding usage:
 
     def gen_drop_all(self):
         """generate sql statements for dropping all created tables"""
+        if self.Store is not None:
+            for tname in self.Store.created_tables():
+                print("drop table %s ;" % tname)
+            return
         for e in self.EntityList:
             for ct in e.gen_drops():
                 print(ct)
@@ -419,8 +714,12 @@ coding usage:
     def gen_drop_mid(self):
         """generate sql statements for dropping all tables except the final ones
 the final ones are left for use."""
+        if self.Store is not None:
+            for tname in self.Store.created_tables(mid_only=True):
+                print("drop table %s ;" % tname)
+            return
         for e in self.EntityList:
-            if e.is_final_task:
+            if e.is_final_task():
                 continue
             for ct in e.gen_drops():
                 print(ct)
@@ -428,15 +727,40 @@ the final ones are left for use."""
     def set_search_pattern(self,pattern):
         self.SearchPattern = pattern
 
+    def set_workers(self, workers):
+        """number of threads reading sql files in run(), default is DefaultWorkers"""
+        self.Workers = workers
+
+    def __is_archive__(self, tardir):
+        return os.path.isfile(tardir) and zipfile.is_zipfile(tardir)
+
+    def __strip_compression__(self, fname):
+        """a.sql.gz -> a.sql, others are left as they are"""
+        root, ext = os.path.splitext(fname)
+        if ext.lower() in self.CompressedOpeners:
+            return root
+        return fname
+
     def __scan__(self, tardir):
-        os.chdir(tardir)
+        """file names are relative to tardir, or member paths if tardir is a zip bundle.
+        compressed files match the search pattern by their name without .gz/.bz2/.xz"""
         FileNames = []
-        for fname in glob.glob(self.SearchPattern.lower()):
-            FileNames.append(fname)
-        for fname in glob.glob(self.SearchPattern.upper()):
-            FileNames.append(fname)
+        patterns = (self.SearchPattern.lower(), self.SearchPattern.upper())
+        if self.__is_archive__(tardir):
+            with zipfile.ZipFile(tardir) as archive:
+                for fname in archive.namelist():
+                    if fname.endswith("/"):
+                        continue
+                    base = os.path.basename(self.__strip_compression__(fname))
+                    if any(fnmatch.fnmatchcase(base, pattern) for pattern in patterns):
+                        FileNames.append(fname)
+        else:
+            suffixes = [""] + list(self.CompressedOpeners.keys())
+            for pattern in patterns:
+                for suffix in suffixes:
+                    for fname in glob.glob(os.path.join(glob.escape(tardir), pattern + suffix)):
+                        FileNames.append(os.path.relpath(fname, tardir))
         FileNames = list(set(FileNames))
-        self.FileNames = FileNames
         if len(FileNames)==0:
             self.log("warning","no file found under pattern",self.SearchPattern.lower(),"or",self.SearchPattern.upper())
         return FileNames
@@ -445,27 +769,116 @@ the final ones are left for use."""
         # TODO
         pass
 
-    def __discover_dep__(self, filename):
-        fstr = None
-        try:
-            self.useutf8()
-            fstr = open(filename, 'r', encoding=self.encoding).read().lower()
-        except:
-            self.usegbk()
-            fstr = open(filename, 'r', encoding=self.encoding).read().lower()
+    def __read_source__(self, filename, tardir=".", archive=None):
+        """raw bytes of a sql file, decompressed in memory.
+        archive is the opened zip bundle when tardir is one.
+        members are decompressed straight from the archive/compressed file, never to disk,
+        but each one is read whole: the extractor needs the full text to split statements."""
+        if archive is not None:
+            raw = archive.open(filename)
         else:
-            pass
-        create_pattern2 = """(?:create\s+table\s+(?:if\s+not\s+exists\s+)?)(\w+)"""
-        creates = [t for t in re.findall(create_pattern2, fstr)]
-        ##       dep_pattern1="""(?:from\s+)(\w+\s*\:\s*\:)?(?:\s*)(\w+)"""
-        ##       dep_pattern2="""(?:join\s+)(\w+\s*\:\s*\:)?(?:\s*)(\w+)(?:\s+\w+)?(?:\s+on)"""
-        dep_pattern = """(?:(?:from|join)\s+)(?:(\w+)(?:\s*\:\s*\:))?(?:\s*)(\w+)"""
-        deps = [t for t in re.findall(dep_pattern, fstr)]
+            raw = open(os.path.join(tardir, filename), 'rb')
+        with raw:
+            opener = self.CompressedOpeners.get(os.path.splitext(filename)[1].lower())
+            if opener is None:
+                return raw.read()
+            with opener(raw) as f:
+                return f.read()
+
+    def __split_statements__(self, fstr):
+        """return (first line, last line, text) of each non-blank statement, lines start from 1
+        text is stripped and does not keep its ';'"""
+        statements = []
+        line = 1
+        for piece in fstr.split(";"):
+            if piece.count("create") < 2:
+                texts = [piece]
+            else:  # several 'create table' without ';' between them
+                cuts = [0] + [m.start() for m in self.CreateLine.finditer(piece)] + [len(piece)]
+                texts = [piece[start:end] for start, end in zip(cuts, cuts[1:])]
+            for text in texts:
+                stripped = text.strip()
+                if len(stripped) > 0:
+                    first = line + text.count("\n", 0, len(text) - len(text.lstrip()))
+                    statements.append((first, first + stripped.count("\n"), stripped))
+                line += text.count("\n")
+        return statements
+
+    def __discover_dep__(self, filename, tardir=".", archive=None):
+        """encoding is tried first, then gbk. self.encoding is never changed here
+        return (creates, deps, statements).
+        an unchanged file is taken whole from FileCache. a changed one is split into statements,
+        only statements not in StatementCache are extracted again."""
+        data = self.__read_source__(filename, tardir, archive)
+        if self.Store is not None:  # memory must stay bounded in store mode
+            return self.__discover_statements__(self.__decode__(data), False)
+        key = (hashlib.sha1(data).digest(), self.encoding)
+        with self.CacheLock:
+            found = self.FileCache.get(key)
+            if found is not None:
+                self.FileCache.move_to_end(key)
+        if found is None:
+            found = self.__discover_statements__(self.__decode__(data), True)
+            with self.CacheLock:
+                self.__cache_put__(self.FileCache, self.FileCacheSize, [(key, found)])
+        (creates, deps, statements) = found
+        ## callers patch these lists in place, never hand out the cached ones
+        return (list(creates), list(deps), list(statements))
+
+    def __decode__(self, data):
+        try:
+            return data.decode(self.encoding).lower()
+        except UnicodeDecodeError:
+            return data.decode("gb2312").lower()
+
+    def __cache_put__(self, cache, size, items):
+        """CacheLock must be held"""
+        for key, value in items:
+            cache[key] = value
+        while len(cache) > size:
+            cache.popitem(last=False)
+
+    def __discover_statements__(self, fstr, use_cache):
+        split = self.__split_statements__(fstr)
+        known = {}
+        if use_cache:
+            with self.CacheLock:
+                cache = self.StatementCache
+                for (first, last, text) in split:
+                    found = cache.get(text)
+                    if found is not None:
+                        cache.move_to_end(text)
+                        known[text] = found
+        extracted = []
+        creates = []
+        deps = []
+        statements = []
+        for (first, last, text) in split:
+            found = known.get(text)
+            if found is None:
+                found = self.__extract__(text)
+                known[text] = found
+                extracted.append((text, found))
+            (c, d) = found
+            creates.extend(c)
+            deps.extend(d)
+            statements.append((first, last, c, d))
+        if use_cache and len(extracted) > 0:
+            with self.CacheLock:
+                self.__cache_put__(self.StatementCache, self.StatementCacheSize, extracted)
+        return (creates, deps, statements)
+
+    def __extract__(self, fstr):
+        """(creates, deps) of lower-cased sql text"""
+        creates = self.CreatePattern.findall(fstr)
+        deps = self.DepPattern.findall(fstr)
         return (creates, deps)
 
-    def __build_forest__(self):
-        iters = len(self.EntityList) - 1
-        EntityList = self.EntityList.copy()
+    def __build_forest__(self, entity_list=None):
+        if entity_list is None:
+            entity_list = self.EntityList
+        iters = len(entity_list)  # the last one is bound against nothing, to get its missing deps
+        EntityList = entity_list.copy()
         for i in range(iters):
             entity = EntityList.pop()
             entity.__bound_relation__(EntityList)
@@ -484,7 +897,25 @@ the final ones are left for use."""
             missing_tables.extend(e.MissingDeps)
         self.MissingTables = sorted(list(set(missing_tables)), key=len, reverse=True)
 
+    def check_catalog(self, catalog):
+        """check every missing table against a real database catalog, after run().
+        catalog is a CatalogChecker. tables confirmed missing in the database
+        are used to block incomplete trees, just like the missing-list file of -b.
+        return the confirmed missing tables"""
+        missing_tables = self.MissingTables
+        if self.Store is not None:
+            missing_tables = list(self.Store.missing_tables())
+        missing_deps = catalog.find_missing(missing_tables)
+        self.log("catalog", len(missing_deps), "of", len(missing_tables), "missing tables confirmed")
+        self.__calculate_incomplete__(missing_deps)
+        return missing_deps
+
     def __calculate_incomplete__(self, missing_deps):
+        if missing_deps is not self.ConfirmedMissing:
+            self.ConfirmedMissing.update(missing_deps)
+        if self.Store is not None:
+            self.Store.calculate_incomplete(missing_deps)
+            return
         is_updated = True
         while is_updated:
             is_updated = False
@@ -493,6 +924,441 @@ the final ones are left for use."""
                 is_updated = is_updated or (last_status != e.check_complete(missing_deps))
 
 
+def run_concurrently(tardirs, max_workers=None, encoding="utf-8", verbose=False):
+    """analyze many directories at once from a thread pool.
+    each directory gets its own SqlAnalyst, returned in the same order as tardirs.
+
+    sas = run_concurrently(["jobs/a", "jobs/b"])
+    sas[0].show()"""
+    def analyze(tardir):
+        sa = SqlAnalyst(encoding)
+        sa.set_log_verbose(verbose)
+        sa.set_workers(1)  # the pool here is parallel enough
+        sa.run(tardir)
+        return sa
+    with ThreadPoolExecutor(max_workers) as executor:
+        return list(executor.map(analyze, tardirs))
+
+
+class ConnectionPool(object):
+    """a tiny DB-API connection pool.
+    connect is any callable returning a new DB-API connection, e.g.
+        lambda: sqlite3.connect("a.db", check_same_thread=False)
+    a connection may be handed to any thread, so connect must return connections usable
+    from threads other than the one creating them (for sqlite, check_same_thread=False).
+    connections are created lazily, at most size of them are kept open.
+
+    with pool.connection() as conn:
+        conn.cursor().execute(...)
+    """
+    def __init__(self, connect, size=4):
+        super(ConnectionPool, self).__init__()
+        self.Connect = connect
+        self.Size = size
+        self.Idle = queue.LifoQueue()
+        self.Opened = 0
+        self.Lock = threading.Lock()
+
+    def acquire(self):
+        """take an idle connection, open a new one if pool is not full, otherwise wait"""
+        try:
+            return self.Idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self.Lock:
+            can_open = self.Opened < self.Size
+            if can_open:
+                self.Opened += 1
+        if can_open:
+            try:
+                return self.Connect()
+            except:
+                with self.Lock:
+                    self.Opened -= 1
+                raise
+        return self.Idle.get()
+
+    def release(self, conn):
+        self.Idle.put(conn)
+
+    def connection(self):
+        """context manager version of acquire()/release()"""
+        return _PooledConnection(self)
+
+    def close(self):
+        """close all idle connections"""
+        while True:
+            try:
+                conn = self.Idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self.Lock:
+                self.Opened -= 1
+
+
+class _PooledConnection(object):
+    def __init__(self, pool):
+        self.Pool = pool
+        self.Conn = None
+
+    def __enter__(self):
+        self.Conn = self.Pool.acquire()
+        return self.Conn
+
+    def __exit__(self, *exc):
+        self.Pool.release(self.Conn)
+        self.Conn = None
+        return False
+
+
+class CatalogChecker(LogWriter):
+    """check table existence against a database catalog, in batches.
+    one catalog query is issued per batch of tables, never one query per table.
+    results are cached for ttl seconds, so repeated checks do not hit the database.
+
+    query must select the names of existing tables among those given, it is formatted
+    with the placeholders of one batch, e.g. the default for sqlite:
+        select name from sqlite_master where type in ('table','view') and lower(name) in (%s)
+    for other databases, something like:
+        select table_name from information_schema.tables where lower(table_name) in (%s)
+    placeholder is the DB-API paramstyle marker of your driver, '?' or '%s' and so on.
+    database prefix (db::table) is ignored, only table names are checked.
+
+    coding usage:
+    0 import sqlite3
+    1 cc = CatalogChecker(ConnectionPool(lambda: sqlite3.connect("warehouse.db", check_same_thread=False)))
+    2 sa.check_catalog(cc)
+    """
+    SqliteCatalogQuery = "select name from sqlite_master where type in ('table','view') and lower(name) in (%s)"
+
+    def __init__(self, pool, query=SqliteCatalogQuery, placeholder="?", batch_size=500, ttl=300):
+        super(CatalogChecker, self).__init__()
+        self.Pool = pool
+        self.Query = query
+        self.Placeholder = placeholder
+        self.BatchSize = batch_size
+        self.TTL = ttl
+        self.Cache = {}  # table name -> (exists, checked time)
+        self.Lock = threading.Lock()
+
+    def __table_name__(self, tname):
+        return tname.split("::")[-1].strip().lower()
+
+    def __query_batch__(self, names):
+        sql = self.Query % ",".join([self.Placeholder] * len(names))
+        with self.Pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(sql, names)
+                return set(str(row[0]).lower() for row in cursor.fetchall())
+            finally:
+                cursor.close()
+
+    def exists(self, tables):
+        """return dict of table name -> whether the table exists in the catalog"""
+        now = time.monotonic()
+        names = sorted(set(self.__table_name__(t) for t in tables))
+        result = {}
+        stale = []
+        with self.Lock:
+            for name in names:
+                cached = self.Cache.get(name)
+                if cached is not None and now - cached[1] < self.TTL:
+                    result[name] = cached[0]
+                else:
+                    stale.append(name)
+        self.log("catalog", len(names) - len(stale), "cached,", len(stale), "to query")
+        for i in range(0, len(stale), self.BatchSize):
+            batch = stale[i:i + self.BatchSize]
+            found = self.__query_batch__(batch)
+            checked = time.monotonic()
+            with self.Lock:
+                for name in batch:
+                    result[name] = name in found
+                    self.Cache[name] = (result[name], checked)
+        return result
+
+    def find_missing(self, tables):
+        """return those of the given tables (formatted as in MissingTables) that really do not exist"""
+        tables = list(tables)
+        existence = self.exists(tables)
+        return [t for t in tables if not existence[self.__table_name__(t)]]
+
+    def invalidate(self):
+        """drop all cached results"""
+        with self.Lock:
+            self.Cache.clear()
+
+
+class SqlStore(object):
+    """on-disk storage of the analysis, for folders too large to keep in memory.
+    entities, created tables, dependencies and edges are spilled to a sqlite database,
+    binding and roots/leaves/missing calculation are done there by set-based joins.
+    all tables of the store are named sqla_*, other tables in the database file are left alone.
+    all threads share one connection, every access to it holds Lock. long listings are read
+    PageSize rows at a time, each page by its own query, so no cursor stays open while other threads write.
+
+    coding usage:
+    0 sa = SqlAnalyst.SqlAnalyst()
+    1 sa.use_store("analysis.db")
+    2 sa.run("d:/works/sqls")
+    3 sa.show_missing()
+    """
+    Tables = ("sqla_entities", "sqla_creates", "sqla_deps", "sqla_edges", "sqla_missing")
+    Schema = """
+    create table sqla_entities (id integer primary key, filename text unique, complete integer default 1);
+    create table sqla_creates (entity_id integer, tname text, first_line integer, last_line integer);
+    create table sqla_deps (entity_id integer, db text, tname text);
+    create table sqla_edges (entity_id integer, dep_id integer);
+    create table sqla_missing (entity_id integer, tname text);
+    """
+    Indexes = """
+    create index if not exists sqla_creates_tname on sqla_creates (tname);
+    create index if not exists sqla_creates_entity on sqla_creates (entity_id);
+    create index if not exists sqla_deps_tname on sqla_deps (tname);
+    create index if not exists sqla_deps_entity on sqla_deps (entity_id);
+    create index if not exists sqla_edges_entity on sqla_edges (entity_id);
+    create index if not exists sqla_edges_dep on sqla_edges (dep_id);
+    create index if not exists sqla_missing_entity on sqla_missing (entity_id);
+    create index if not exists sqla_missing_tname on sqla_missing (tname);
+    """
+    PageSize = 1000
+
+    def __init__(self, path, logger=None):
+        super(SqlStore, self).__init__()
+        self.Path = path
+        self.Logger = logger if logger is not None else LogWriter()
+        ## the connection is used by whichever thread holds Lock
+        self.Conn = sqlite3.connect(path, check_same_thread=False)
+        self.Lock = threading.RLock()
+
+    def log(self, *args):
+        self.Logger.log(*args)
+
+    def __rows__(self, sql, key, args=()):
+        """rows of a query ordered by key, which is also its first column.
+        sql has a %s before its order by, where the next page continues after the last key"""
+        after = ""
+        key_args = ()
+        while True:
+            with self.Lock:
+                rows = self.Conn.execute(sql % after + " limit %d" % self.PageSize, tuple(args) + key_args).fetchall()
+            for row in rows:
+                yield row
+            if len(rows) < self.PageSize:
+                break
+            after = " and %s > ?" % key
+            key_args = (rows[-1][0],)
+
+    def clear(self):
+        """drop the last analysis, create empty tables"""
+        with self.Lock:
+            for table in self.Tables:
+                self.Conn.execute("drop table if exists %s" % table)
+            self.Conn.executescript(self.Schema)
+            self.Conn.commit()
+
+    def add_entities(self, discovered):
+        """discovered: iterable of (filename, (creates, deps, statements)), as returned by __discover_dep__"""
+        ## files are read by the iteration, keep that outside the lock
+        for filename, (c, d, statements) in discovered:
+            with self.Lock:
+                entity_id = self.Conn.execute("insert into sqla_entities (filename) values (?)",
+                                              (filename,)).lastrowid
+                self.__add_tables__(entity_id, c, d, statements)
+        with self.Lock:
+            self.Conn.commit()
+
+    def __add_tables__(self, entity_id, creates, deps, statements):
+        if len(statements) > 0:
+            rows = [(entity_id, t, first, last) for (first, last, sc, sd) in statements for t in sc]
+        else:
+            rows = [(entity_id, t, None, None) for t in creates]
+        self.Conn.executemany("insert into sqla_creates values (?,?,?,?)", rows)
+        self.Conn.executemany("insert into sqla_deps values (?,?,?)", [(entity_id, db, t) for (db, t) in deps])
+
+    def __entity_id__(self, filename):
+        with self.Lock:
+            row = self.Conn.execute("select id from sqla_entities where filename = ?", (filename,)).fetchone()
+        return None if row is None else row[0]
+
+    def update_entity(self, filename, discovered):
+        """put the new creates/deps of one sql-file in place of the old ones (discovered is None
+        for a deleted file), then bind only this file and find missing tables of the files it touches"""
+        with self.Lock:
+            self.__update_entity__(filename, discovered)
+
+    def __update_entity__(self, filename, discovered):
+        entity_id = self.__entity_id__(filename)
+        self.Conn.execute("create temp table if not exists sqla_affected (tname text primary key)")
+        self.Conn.execute("delete from sqla_affected")
+        if entity_id is not None:
+            self.Conn.execute("insert or ignore into sqla_affected select tname from sqla_creates where entity_id = ?",
+                              (entity_id,))
+            self.Conn.execute("delete from sqla_creates where entity_id = ?", (entity_id,))
+            self.Conn.execute("delete from sqla_deps where entity_id = ?", (entity_id,))
+            self.Conn.execute("delete from sqla_edges where entity_id = ? or dep_id = ?", (entity_id, entity_id))
+            self.Conn.execute("delete from sqla_missing where entity_id = ?", (entity_id,))
+        if discovered is None:
+            if entity_id is not None:
+                self.Conn.execute("delete from sqla_entities where id = ?", (entity_id,))
+        else:
+            (c, d, statements) = discovered
+            if entity_id is None:
+                entity_id = self.Conn.execute("insert into sqla_entities (filename) values (?)",
+                                              (filename,)).lastrowid
+            self.__add_tables__(entity_id, c, d, statements)
+            self.Conn.executemany("insert or ignore into sqla_affected values (?)", ((t,) for t in c))
+            self.Conn.execute("""insert into sqla_edges
+                select distinct d.entity_id, c.entity_id from sqla_deps d join sqla_creates c on c.tname = d.tname
+                where d.entity_id = ? and c.entity_id != d.entity_id""", (entity_id,))
+            self.Conn.execute("""insert into sqla_edges
+                select distinct d.entity_id, c.entity_id from sqla_creates c join sqla_deps d on c.tname = d.tname
+                where c.entity_id = ? and c.entity_id != d.entity_id""", (entity_id,))
+        ## files using a table this one created before or creates now, and this one itself
+        self.Conn.execute("""delete from sqla_missing where entity_id in
+            (select entity_id from sqla_deps where tname in (select tname from sqla_affected))""")
+        self.Conn.execute("""insert into sqla_missing
+            select entity_id, case when max(db) != '' then max(db) || '::' || tname else tname end
+            from sqla_deps d where not exists (select 1 from sqla_creates c where c.tname = d.tname)
+            and (entity_id = ? or entity_id in
+                (select entity_id from sqla_deps where tname in (select tname from sqla_affected)))
+            group by entity_id, tname order by min(d.rowid)""", (entity_id,))
+        self.Conn.commit()
+
+    def reset_complete(self):
+        """set all files complete, before applying missing lists again"""
+        with self.Lock:
+            self.Conn.execute("update sqla_entities set complete = 1")
+            self.Conn.commit()
+
+    def build(self):
+        """bind all entities and calculate missing tables, log tables a file uses that more than one
+        other file creates, and files depending on each other"""
+        with self.Lock:
+            self.Conn.executescript(self.Indexes)
+            self.Conn.execute("update sqla_entities set complete = 1")
+            self.Conn.execute("delete from sqla_edges")
+            self.Conn.execute("""insert into sqla_edges
+                select distinct d.entity_id, c.entity_id from sqla_deps d join sqla_creates c on c.tname = d.tname
+                where c.entity_id != d.entity_id""")
+            self.Conn.execute("delete from sqla_missing")
+            ## nobody creates it, append database prefix if it has one
+            self.Conn.execute("""insert into sqla_missing
+                select entity_id, case when max(db) != '' then max(db) || '::' || tname else tname end
+                from sqla_deps d where not exists (select 1 from sqla_creates c where c.tname = d.tname)
+                group by entity_id, tname order by min(d.rowid)""")
+            self.Conn.commit()
+            ## a file using a table more than one other file creates, as __bound_relation__ reports it
+            duplicates = self.Conn.execute("""select c.tname, group_concat(e.filename, ' ')
+                from (select distinct tname, entity_id from sqla_creates) c join sqla_entities e on e.id = c.entity_id
+                where exists (select 1 from sqla_deps d where d.tname = c.tname and (select count(distinct o.entity_id)
+                    from sqla_creates o where o.tname = d.tname and o.entity_id != d.entity_id) > 1)
+                group by c.tname having count(distinct c.entity_id) > 1 order by min(c.entity_id)""").fetchall()
+            loops = self.Conn.execute("""select a.filename, b.filename from sqla_edges x
+                join sqla_edges y on y.entity_id = x.dep_id and y.dep_id = x.entity_id
+                join sqla_entities a on a.id = x.entity_id join sqla_entities b on b.id = x.dep_id
+                where x.entity_id < x.dep_id order by x.entity_id, x.dep_id""").fetchall()
+        for (tname, fnames) in duplicates:
+            self.log("error", "Duplicate Table", tname, "created by", fnames)
+        for (fname, dep_fname) in loops:
+            self.log("error", "Loop Depend:", fname, dep_fname)
+
+    def calculate_incomplete(self, missing_deps):
+        """mark files using a confirmed missing table, and every file depending on them, as incomplete"""
+        with self.Lock:
+            self.Conn.execute("create temp table if not exists sqla_confirmed (tname text primary key)")
+            self.Conn.execute("delete from sqla_confirmed")
+            self.Conn.executemany("insert or ignore into sqla_confirmed values (?)", ((md,) for md in missing_deps))
+            self.Conn.execute("""update sqla_entities set complete = 0 where id in (
+                with recursive bad(id) as (
+                    select entity_id from sqla_missing where tname in (select tname from sqla_confirmed)
+                    union select e.entity_id from sqla_edges e join bad on e.dep_id = bad.id)
+                select id from bad)""")
+            self.Conn.commit()
+
+    def count_entities(self):
+        with self.Lock:
+            return self.Conn.execute("select count(*) from sqla_entities").fetchone()[0]
+
+    def roots(self):
+        """(id, filename, complete) of files no other file depends on"""
+        return self.__rows__("""select id, filename, complete from sqla_entities e
+            where not exists (select 1 from sqla_edges where dep_id = e.id) %s order by id""", "id")
+
+    def root(self, no):
+        """(id, filename, complete) of the no-th root, in the order of roots(), None if there is not"""
+        with self.Lock:
+            return self.Conn.execute("""select id, filename, complete from sqla_entities e
+                where not exists (select 1 from sqla_edges where dep_id = e.id) order by id limit 1 offset ?""",
+                                     (no,)).fetchone()
+
+    def bases(self):
+        """(id, filename, complete) of files depending on no other file"""
+        return self.__rows__("""select id, filename, complete from sqla_entities e
+            where not exists (select 1 from sqla_edges where entity_id = e.id) %s order by id""", "id")
+
+    def failures(self):
+        """file names of incomplete files whose deps are all complete"""
+        return (row[1] for row in self.__rows__("""select id, filename from sqla_entities e
+            where complete = 0 and not exists (select 1 from sqla_edges join sqla_entities d
+            on d.id = sqla_edges.dep_id where sqla_edges.entity_id = e.id and d.complete = 0) %s order by id""",
+                                                 "id"))
+
+    def deps_of(self, entity_id):
+        """(id, filename) of files this one depends on"""
+        with self.Lock:
+            return self.Conn.execute("""select e.id, e.filename from sqla_edges join sqla_entities e
+                on e.id = sqla_edges.dep_id where sqla_edges.entity_id = ? order by e.id""",
+                                     (entity_id,)).fetchall()
+
+    def created_tables(self, fname=None, mid_only=False):
+        """tables created by a sql-file, or by all of them.
+        mid_only leaves out tables of final files (no other file depends on them)"""
+        sql = """select c.rowid, c.tname from sqla_creates c join sqla_entities e on e.id = c.entity_id where 1 = 1"""
+        args = []
+        if fname is not None:
+            sql += " and e.filename = ?"
+            args.append(fname)
+        if mid_only:
+            sql += " and exists (select 1 from sqla_edges where dep_id = e.id)"
+        return (row[1] for row in self.__rows__(sql + " %s order by c.rowid", "c.rowid", args))
+
+    def missing_tables(self):
+        """all missing tables, longest name first"""
+        with self.Lock:
+            return [row[0] for row in self.Conn.execute(
+                "select distinct tname from sqla_missing order by length(tname) desc, tname")]
+
+    def find(self, table):
+        """file names creating this table"""
+        with self.Lock:
+            return [row[0] for row in self.Conn.execute("""select distinct e.filename from sqla_creates c
+                join sqla_entities e on e.id = c.entity_id where c.tname = ? order by e.id""", (table,))]
+
+    def info(self, fname):
+        """(creates, uses, missing, created at) of a sql-file, None if not found"""
+        with self.Lock:
+            entity_id = self.__entity_id__(fname)
+            if entity_id is None:
+                return None
+            creates = self.Conn.execute("""select tname, first_line, last_line from sqla_creates
+                where entity_id = ? order by rowid""", (entity_id,)).fetchall()
+            uses = [r[0] + r[1] for r in self.Conn.execute("""select db, tname from sqla_deps d where entity_id = ?
+                and exists (select 1 from sqla_creates c where c.tname = d.tname and c.entity_id != d.entity_id)
+                order by rowid""", (entity_id,))]
+            missing = [r[0] for r in self.Conn.execute(
+                "select tname from sqla_missing where entity_id = ? order by length(tname) desc, rowid",
+                (entity_id,))]
+        created_at = ["%s: lines %d-%d" % c for c in creates if c[1] is not None]
+        return ([c[0] for c in creates], uses, missing, created_at)
+
+    def close(self):
+        """close the connection"""
+        with self.Lock:
+            self.Conn.close()
+
 #####################################
 version = '''1.3.3'''
 #####################################
@@ -586,12 +1452,14 @@ def __arg_v__(sa, arg_map, arg_index):
 
 
 def __arg_t__(sa, arg_map, arg_index, value):
-    global default_dir
-    default_dir = value
+    pass  # read by __run__
 
 def __arg_s__(sa, arg_map, arg_index, value):
     sa.set_search_pattern(value)
 
+def __arg_o__(sa, arg_map, arg_index, value):
+    sa.use_store(value)
+
 def __help__(sa, arg_map, arg_index):
     print(SqlAnalyst.__doc__)
     for info in arg_map:
@@ -606,13 +1474,27 @@ def __arg_d__(sa, arg_map, arg_index):
 
 
 def __run__(sa, arg_map, arg_index):
-    sa.run(default_dir)
+    target_dir = arg_map[__locate_arg_no__(arg_type_fullname, "target-dir", arg_map, arg_index)]
+    if target_dir[arg_index["argument set"]]:
+        sa.run(target_dir[arg_index["argument value"]])
+    else:
+        sa.run(default_dir)
 
 
 def __arg_b__(sa, arg_map, arg_index, value):
     missing_deps = [line.lstrip().rstrip() for line in open(value, 'r')]
     sa.__calculate_incomplete__(missing_deps)
 
+def __arg_c__(sa, arg_map, arg_index, value):
+    if not os.path.isfile(value):
+        print("catalog: no such sqlite database", value)
+        exit(0)
+    pool = ConnectionPool(lambda: sqlite3.connect(value, check_same_thread=False))
+    catalog = CatalogChecker(pool)
+    catalog.set_log_verbose(sa.Verbose)
+    sa.check_catalog(catalog)
+    pool.close()
+
 def __arg_g__(sa, arg_map, arg_index, value):
     if value == "drop-all":
         sa.gen_drop_all()
@@ -620,6 +1502,11 @@ def __arg_g__(sa, arg_map, arg_index, value):
     elif value == "drop-mid":
         sa.gen_drop_mid()
         exit()
+    elif os.path.isfile(value) and sa.Store is not None:
+        if sa.Store.info(value) is not None:
+            for tname in sa.Store.created_tables(value):
+                print ("drop table %s ;" % tname)
+            exit(0)
     elif os.path.isfile(value):
         for e in sa.EntityList:
             if e.FileName == value :
@@ -646,14 +1533,16 @@ __arg_map__ = [
     ["version",no_abbr,__none__,no_argument,arg_not_set,arg_val,"sqla, version "+version+" by sorenchen. copyright 2015-2016"],
     ["bad arg", no_abbr, __bad_arg__, no_argument, arg_not_set, arg_val,no_doc],
     ["verbose", 'v', __arg_v__, no_argument, arg_not_set, arg_val,"show processing logs or not"],
-    ["target-dir", 't', __arg_t__, require_argument, arg_not_set, arg_val,"dir should not end with \\ or /"],
+    ["target-dir", 't', __arg_t__, require_argument, arg_not_set, arg_val,"dir should not end with \\ or /, \n\t\ta .zip bundle of sqls is also accepted, \n\t\tits sqls are scanned at any depth"],
     ["search-pattern",'s',__arg_s__, require_argument, arg_not_set, arg_val,"default *.sql/SQL. you can use *.* and so on"],
+    ["store", 'o', __arg_o__, require_argument, arg_not_set, arg_val,"out-of-core mode for huge folders, keep the analysis \n\t\tin the given sqlite database file instead of memory"],
     ["encoding", 'e', __none__, require_argument, arg_not_set, arg_val,no_doc],  # TODO:: set encoding
     ["help", 'h', __help__, no_argument, arg_not_set, arg_val,"show help information"],  # TODO:: show help
     ["dry-run", 'd', __arg_d__, no_argument, arg_not_set, arg_val,"run but don't show, should be followed by other \n\t\tcommands if you want see something come out"],  # don't show[]
     ## run stage
     ["run", no_abbr, __run__, no_argument, arg_is_set, arg_val,no_doc],  # This is the RUN[] stage
     ["block-incomplete", 'b', __arg_b__, require_argument, arg_not_set, arg_val,"don't show incomplete branch that really \n\t\tmissing deps, given a file containing confirmed missing table, \n\t\tone table-name each line, No database prefix."],
+    ["catalog", 'c', __arg_c__, require_argument, arg_not_set, arg_val,"don't show incomplete branch that really \n\t\tmissing deps, confirmed by checking the catalog \n\t\tof the given sqlite database file"],
     ["generate",'g',__arg_g__, require_argument, arg_not_set, arg_val,"generate utils for sql maintenance,\n\t\taccept param: drop-all | drop-mid | filename"],
     # don't show the branch tha cannot run
     ["show", no_abbr, __show__, no_argument, arg_is_set, arg_val,no_doc],
@@ -667,6 +1556,11 @@ __arg_index__ = {"full name": 0, "abbreviation": 1, "function": 2, "has argument
                  "argument value": 5,"doc":6}
 
 
+def __new_arg_map__():
+    """__resolve_arguments__ writes into the arg map, so every command line gets its own copy"""
+    return [list(arg_info) for arg_info in __arg_map__]
+
+
 def __resolve_arguments__(args, arg_map, arg_index):
     total = len(args)
     dealing = 0
@@ -704,8 +1598,9 @@ def __exec__(sa, arg_map, arg_index):
 if __name__ == "__main__":
     sa = SqlAnalyst()
     sa.set_log_verbose(False)
+    arg_map = __new_arg_map__()
 
     if len(sys.argv) > 1:
         args = sys.argv[1:]
-        __resolve_arguments__(args, __arg_map__, __arg_index__)
-    __exec__(sa, __arg_map__, __arg_index__)
+        __resolve_arguments__(args, arg_map, __arg_index__)
+    __exec__(sa, arg_map, __arg_index__)
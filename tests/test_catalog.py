@@ -0,0 +1,110 @@
+import os
+import sqlite3
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import SqlAnalyst
+
+TESTCASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "TestCase")
+
+
+class CountingConnection(object):
+    """wraps a sqlite connection, counts the queries run through its cursors"""
+    def __init__(self, conn, counter):
+        self.Conn = conn
+        self.Counter = counter
+
+    def cursor(self):
+        cursor = self.Conn.cursor()
+        counter = self.Counter
+
+        class CountingCursor(object):
+            def execute(self, sql, args=()):
+                counter.append(sql)
+                return cursor.execute(sql, args)
+
+            def fetchall(self):
+                return cursor.fetchall()
+
+            def close(self):
+                cursor.close()
+        return CountingCursor()
+
+    def close(self):
+        self.Conn.close()
+
+
+def make_catalog(path, tables):
+    conn = sqlite3.connect(path)
+    for t in tables:
+        conn.execute("create table %s (x)" % t)
+    conn.commit()
+    conn.close()
+
+
+def checker(path, queries, **kwargs):
+    pool = SqlAnalyst.ConnectionPool(
+        lambda: CountingConnection(sqlite3.connect(path, check_same_thread=False), queries))
+    cc = SqlAnalyst.CatalogChecker(pool, **kwargs)
+    cc.set_log_verbose(False)
+    return cc
+
+
+def test_batches(tmp_path):
+    path = str(tmp_path / "catalog.db")
+    make_catalog(path, ["t0", "t2", "T4"])
+    queries = []
+    cc = checker(path, queries, batch_size=2)
+    tables = ["t%d" % i for i in range(5)]
+    assert cc.find_missing(tables) == ["t1", "t3"]
+    assert len(queries) == 3
+
+
+def test_ttl(tmp_path):
+    path = str(tmp_path / "catalog.db")
+    make_catalog(path, ["t0"])
+    queries = []
+    cc = checker(path, queries, ttl=60)
+    assert cc.find_missing(["t0", "t1"]) == ["t1"]
+    assert cc.find_missing(["t0", "t1"]) == ["t1"]
+    assert len(queries) == 1
+    cc.TTL = 0
+    assert cc.find_missing(["t0", "t1"]) == ["t1"]
+    assert len(queries) == 2
+
+
+def test_database_prefix_is_ignored(tmp_path):
+    path = str(tmp_path / "catalog.db")
+    make_catalog(path, ["secondtable"])
+    cc = checker(path, [])
+    assert cc.find_missing(["hy_db::secondtable", "hy_db::other", "other"]) == ["hy_db::other", "other"]
+
+
+def test_pool_connection_used_from_another_thread(tmp_path):
+    path = str(tmp_path / "catalog.db")
+    make_catalog(path, ["t0"])
+    cc = checker(path, [], ttl=0)
+    assert cc.find_missing(["t1"]) == ["t1"]
+    result = []
+    worker = threading.Thread(target=lambda: result.append(cc.find_missing(["t0", "t1"])))
+    worker.start()
+    worker.join()
+    assert result == [["t1"]]
+
+
+def test_check_catalog_blocks_incomplete_trees(tmp_path):
+    path = str(tmp_path / "catalog.db")
+    make_catalog(path, ["basic"])
+    sa = SqlAnalyst.SqlAnalyst()
+    sa.set_log_verbose(False)
+    sa.run(TESTCASE)
+    assert all(e.Complete for e in sa.EntityList)
+    assert sa.check_catalog(checker(path, [])) == ["active"]
+    assert [e.Complete for e in sa.RootEntities] == [False]
+
+    make_catalog(str(tmp_path / "full.db"), ["basic", "active"])
+    sa.run(TESTCASE)
+    assert sa.check_catalog(checker(str(tmp_path / "full.db"), [])) == []
+    assert [e.Complete for e in sa.RootEntities] == [True]
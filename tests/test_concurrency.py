@@ -0,0 +1,41 @@
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import SqlAnalyst
+
+
+def make_dirs(root, count=6, files=20):
+    rnd = random.Random(7)
+    dirs = []
+    for d in range(count):
+        path = os.path.join(str(root), "job%d" % d)
+        os.makedirs(path)
+        for i in range(files):
+            deps = " ".join("join t%d on 1=1" % rnd.randrange(files + 5) for _ in range(2))
+            with open(os.path.join(path, "f%d.sql" % i), "w") as f:
+                f.write("create table t%d as\nselect * from t%d %s;\n" % (i, rnd.randrange(files + 5), deps))
+        dirs.append(path)
+    return dirs
+
+
+def summary(sa):
+    return (sorted(e.FileName for e in sa.RootEntities),
+            sorted(e.FileName for e in sa.BaseEntities),
+            sorted(sa.MissingTables))
+
+
+def test_concurrent_runs_match_serial_runs(tmp_path):
+    dirs = make_dirs(tmp_path)
+    serial = []
+    for d in dirs:
+        sa = SqlAnalyst.SqlAnalyst()
+        sa.set_log_verbose(False)
+        sa.run(d)
+        serial.append(summary(sa))
+    cwd = os.getcwd()
+    concurrent = SqlAnalyst.run_concurrently(dirs * 8, max_workers=16)
+    assert os.getcwd() == cwd
+    assert [summary(sa) for sa in concurrent] == serial * 8
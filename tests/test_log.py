@@ -0,0 +1,71 @@
+import io
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import SqlAnalyst
+
+
+class Counted(object):
+    def __init__(self):
+        self.Calls = 0
+
+    def __str__(self):
+        self.Calls += 1
+        return "counted"
+
+
+def writer():
+    log = SqlAnalyst.LogWriter()
+    log.set_log_writer(io.StringIO())
+    return log
+
+
+def test_muted_log_is_never_formatted():
+    log = writer()
+    log.set_log_verbose(False)
+    arg = Counted()
+    log.log("log", arg)
+    log.log("warning", arg)
+    assert arg.Calls == 0
+    assert log.Writer.getvalue() == ""
+    log.log("error", arg)
+    log.log("log", arg, force=True)
+    assert arg.Calls == 2
+
+
+def test_verbose_attribute_mutes_like_set_log_verbose():
+    log = writer()
+    log.Verbose = False
+    arg = Counted()
+    log.log("log", arg)
+    assert arg.Calls == 0
+    assert not log.enabled("log") and log.enabled("error")
+    log.Verbose = True
+    log.log("log", arg)
+    assert arg.Calls == 1
+
+
+def test_levels():
+    log = writer()
+    log.set_log_level(SqlAnalyst.LogWriter.LogLevels["warning"])
+    assert not log.Verbose
+    assert not log.enabled("log") and log.enabled("warning") and log.enabled("error")
+
+
+def test_bind_phase_does_not_format_when_muted():
+    sa = SqlAnalyst.SqlAnalyst()
+    sa.Verbose = False
+    sa.set_log_writer(io.StringIO())
+    names = []
+
+    class Name(str):
+        def __str__(self):
+            names.append(self)
+            return str.__str__(self)
+    entities = [SqlAnalyst.SqlEntity(Name("f%d.sql" % i), ["t%d" % i], [("", "t%d" % (i + 1))], sa)
+                for i in range(20)]
+    sa.__build_forest__(entities)
+    assert names == []
+    assert sa.Writer.getvalue() == ""
@@ -0,0 +1,62 @@
+import bz2
+import gzip
+import lzma
+import os
+import sys
+import zipfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import SqlAnalyst
+
+SQLS = {
+    "a.sql": "create table ta as select * from src;\n",
+    "b.sql": "create table tb as select * from ta;\n",
+    "c.sql": "create table tc as select * from tb join hy_db::td on 1=1;\n",
+}
+
+
+def analyst(tardir):
+    sa = SqlAnalyst.SqlAnalyst()
+    sa.set_log_verbose(False)
+    sa.run(tardir)
+    return sa
+
+
+def summary(sa):
+    return (sorted(e.FileName for e in sa.RootEntities),
+            sorted(e.FileName for e in sa.BaseEntities),
+            sorted(sa.MissingTables))
+
+
+def test_compressed_files_in_folder(tmp_path):
+    (tmp_path / "a.sql").write_text(SQLS["a.sql"])
+    with gzip.open(str(tmp_path / "b.sql.gz"), "wt") as f:
+        f.write(SQLS["b.sql"])
+    with lzma.open(str(tmp_path / "C.SQL.xz"), "wt") as f:
+        f.write(SQLS["c.sql"])
+    with bz2.open(str(tmp_path / "notes.txt.bz2"), "wt") as f:
+        f.write("create table ignored from nothing")
+    sa = analyst(str(tmp_path))
+    assert sorted(sa.FileNames) == ["C.SQL.xz", "a.sql", "b.sql.gz"]
+    assert summary(sa) == (["C.SQL.xz"], ["a.sql"], ["hy_db::td", "src"])
+
+
+def test_zip_bundle_with_nested_and_compressed_members(tmp_path):
+    bundle = str(tmp_path / "jobs.zip")
+    with zipfile.ZipFile(bundle, "w") as z:
+        z.writestr("jobs/a.sql", SQLS["a.sql"])
+        z.writestr("jobs/sub/b.sql.bz2", bz2.compress(SQLS["b.sql"].encode()))
+        z.writestr("jobs/c.sql.gz", gzip.compress(SQLS["c.sql"].encode()))
+        z.writestr("jobs/readme.md", "create table nope from nothing")
+    sa = analyst(bundle)
+    assert sorted(e.FileName for e in sa.EntityList) == ["jobs/a.sql", "jobs/c.sql.gz", "jobs/sub/b.sql.bz2"]
+    assert summary(sa) == (["jobs/c.sql.gz"], ["jobs/a.sql"], ["hy_db::td", "src"])
+
+    with zipfile.ZipFile(bundle, "w") as z:
+        z.writestr("jobs/a.sql", SQLS["a.sql"])
+        z.writestr("jobs/sub/b.sql.bz2", bz2.compress(b"create table tb as select * from other;\n"))
+        z.writestr("jobs/c.sql.gz", gzip.compress(SQLS["c.sql"].encode()))
+    sa.update("jobs/sub/b.sql.bz2")
+    assert sorted(e.FileName for e in sa.RootEntities) == ["jobs/a.sql", "jobs/c.sql.gz"]
+    assert "other" in sa.MissingTables
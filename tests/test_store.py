@@ -0,0 +1,121 @@
+import io
+import os
+import random
+import sqlite3
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import SqlAnalyst
+
+TESTCASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "TestCase")
+
+
+def test_store_run_in_another_thread_keeps_foreign_tables(tmp_path, capsys):
+    path = str(tmp_path / "own.db")
+    conn = sqlite3.connect(path)
+    conn.execute("create table deps (x)")
+    conn.execute("insert into deps values (1)")
+    conn.commit()
+
+    sa = SqlAnalyst.SqlAnalyst()
+    sa.set_log_verbose(False)
+    sa.use_store(path)
+    worker = threading.Thread(target=sa.run, args=(TESTCASE,))
+    worker.start()
+    worker.join()
+
+    assert conn.execute("select count(*) from deps").fetchone()[0] == 1
+    assert sa.Store.count_entities() == 3
+    assert [fname for (entity_id, fname, complete) in sa.Store.roots()] == ["c.sql"]
+
+    capsys.readouterr()
+    sa.gen_drop_all()
+    assert sorted(capsys.readouterr().out.split("\n")) == ["", "drop table imfirsttable ;",
+                                                           "drop table lasttable ;", "drop table secondtable ;"]
+    sa.show_by_root_no(0)
+    assert capsys.readouterr().out.startswith("* c.sql")
+    sa.Store.close()
+
+
+def errors(writer):
+    """duplicate tables and loop pairs logged by a run"""
+    duplicates = set()
+    loops = set()
+    for line in writer.getvalue().splitlines():
+        words = line.split()
+        if words[0] == "##ERROR##:Duplicate":
+            duplicates.add(words[2])
+        elif words[0] == "##ERROR##:Loop":
+            loops.add(frozenset(words[2:4]))
+    return (duplicates, loops)
+
+
+def results(sa):
+    if sa.Store is not None:
+        with sa.Store.Lock:
+            files = [row[0] for row in sa.Store.Conn.execute("select filename from sqla_entities")]
+            incomplete = set(row[0] for row in sa.Store.Conn.execute(
+                "select filename from sqla_entities where complete = 0"))
+        return (sorted(f for (i, f, c) in sa.Store.roots()),
+                sorted(f for (i, f, c) in sa.Store.bases()),
+                dict((f, set(sa.Store.info(f)[2])) for f in files),
+                incomplete)
+    return (sorted(e.FileName for e in sa.RootEntities),
+            sorted(e.FileName for e in sa.BaseEntities),
+            dict((e.FileName, set(e.MissingDeps)) for e in sa.EntityList),
+            set(e.FileName for e in sa.EntityList if not e.Complete))
+
+
+def test_store_matches_memory_on_a_generated_folder(tmp_path):
+    rnd = random.Random(7)
+    folder = tmp_path / "sqls"
+    folder.mkdir()
+    for i in range(60):
+        lines = []
+        for _ in range(rnd.randrange(1, 4)):
+            deps = " ".join("join %st%d on 1=1" % (rnd.choice(["", "", "db1.", "db2."]), rnd.randrange(120))
+                            for _ in range(rnd.randrange(3)))
+            lines.append("create table t%d as\nselect * from t%d %s;\n" % (
+                rnd.randrange(100), rnd.randrange(120), deps))
+        with open(str(folder / ("f%02d.sql" % i)), "w") as f:
+            f.write("".join(lines))
+
+    runs = []
+    for use_store in (False, True):
+        sa = SqlAnalyst.SqlAnalyst()
+        sa.set_log_verbose(False)
+        writer = io.StringIO()
+        sa.set_log_writer(writer)
+        if use_store:
+            sa.use_store(str(tmp_path / "store.db"))
+        sa.run(str(folder))
+        sa.__calculate_incomplete__(["t101", "t105", "db1::t110"])
+        runs.append(results(sa) + errors(writer))
+        if use_store:
+            sa.Store.close()
+
+    (memory, store) = runs
+    assert memory == store
+    ## incomplete files, duplicate tables and loops all occur in the generated folder
+    assert memory[3] and memory[4] and memory[5]
+
+
+def test_store_listing_survives_updates_from_another_thread(tmp_path):
+    for i in range(6):
+        with open(str(tmp_path / ("f%d.sql" % i)), "w") as f:
+            f.write("create table t%d as select * from src;\n" % i)
+    sa = SqlAnalyst.SqlAnalyst()
+    sa.set_log_verbose(False)
+    sa.use_store(str(tmp_path / "store.db"))
+    sa.run(str(tmp_path))
+    sa.Store.PageSize = 1
+    roots = []
+    for (entity_id, fname, complete) in sa.Store.roots():
+        roots.append(fname)
+        worker = threading.Thread(target=sa.update, args=(fname,))
+        worker.start()
+        worker.join()
+    assert sorted(roots) == ["f%d.sql" % i for i in range(6)]
+    sa.Store.close()
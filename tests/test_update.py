@@ -0,0 +1,94 @@
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import SqlAnalyst
+
+
+def write(path, text):
+    with open(path, "w") as f:
+        f.write(text)
+
+
+def analyst(tardir):
+    sa = SqlAnalyst.SqlAnalyst()
+    sa.set_log_verbose(False)
+    sa.run(tardir)
+    return sa
+
+
+def test_update_edited_and_deleted_file(tmp_path):
+    write(str(tmp_path / "a.sql"), "create table ta as select * from src;\n")
+    write(str(tmp_path / "b.sql"), "create table tb as select * from ta;\n")
+    sa = analyst(str(tmp_path))
+    assert [e.FileName for e in sa.RootEntities] == ["b.sql"]
+
+    write(str(tmp_path / "b.sql"), "create table tb as select * from other;\n")
+    sa.update("b.sql")
+    assert ("", "other") in [e for e in sa.EntityList if e.FileName == "b.sql"][0].Deps
+    assert sorted(e.FileName for e in sa.RootEntities) == ["a.sql", "b.sql"]
+
+    os.remove(str(tmp_path / "b.sql"))
+    sa.update("b.sql")
+    assert [e.FileName for e in sa.EntityList] == ["a.sql"]
+    assert sa.FileNames == ["a.sql"]
+    assert [e.FileName for e in sa.RootEntities] == ["a.sql"]
+    assert sa.MissingTables == ["src"]
+
+
+def test_statement_cache_is_bounded(tmp_path):
+    write(str(tmp_path / "a.sql"), "".join("create table t%d as select * from s%d;\n" % (i, i) for i in range(50)))
+    sa = SqlAnalyst.SqlAnalyst()
+    sa.set_log_verbose(False)
+    sa.StatementCacheSize = 10
+    sa.run(str(tmp_path))
+    assert len(sa.StatementCache) == 10
+    assert len(sa.FileCache) == 1
+    assert len(sa.EntityList[0].Creates) == 50
+
+
+def state(sa):
+    if sa.Store is not None:
+        store = sa.Store
+        files = [fname for (entity_id, fname, complete) in store.Conn.execute("select * from sqla_entities")]
+        return (sorted(f for (i, f, c) in store.roots()),
+                sorted(f for (i, f, c) in store.bases()),
+                dict((f, sorted(set(store.info(f)[2]))) for f in files),
+                sorted(f for (i, f, c) in store.Conn.execute("select * from sqla_entities where complete = 0")))
+    return (sorted(e.FileName for e in sa.RootEntities),
+            sorted(e.FileName for e in sa.BaseEntities),
+            dict((e.FileName, sorted(set(e.MissingDeps))) for e in sa.EntityList),
+            sorted(e.FileName for e in sa.EntityList if not e.Complete))
+
+
+def test_update_matches_a_fresh_run(tmp_path):
+    rnd = random.Random(11)
+
+    def write_random(i):
+        deps = " ".join("join t%d on 1=1" % rnd.randrange(40) for _ in range(rnd.randrange(3)))
+        write(str(tmp_path / ("f%d.sql" % i)), "create table t%d as\nselect * from t%d %s;\n" % (
+            rnd.randrange(40), rnd.randrange(40), deps))
+    for i in range(30):
+        write_random(i)
+    for use_store in (False, True):
+        sa = SqlAnalyst.SqlAnalyst()
+        sa.set_log_verbose(False)
+        if use_store:
+            sa.use_store(str(tmp_path / "store.db"))
+        sa.run(str(tmp_path))
+        sa.__calculate_incomplete__(["t3", "t7"])
+        for step in range(40):
+            i = rnd.randrange(35)
+            path = tmp_path / ("f%d.sql" % i)
+            if os.path.exists(str(path)) and rnd.random() < 0.2:
+                os.remove(str(path))
+            else:
+                write_random(i)
+            sa.update("f%d.sql" % i)
+            fresh = SqlAnalyst.SqlAnalyst()
+            fresh.set_log_verbose(False)
+            fresh.run(str(tmp_path))
+            fresh.__calculate_incomplete__(["t3", "t7"])
+            assert state(sa) == state(fresh)